@@ -61,6 +61,8 @@ class Card(GObject.GObject):
         # Initialise derived properties
         # Default device description, prefetched from the property list
         self.description = self.get_property_str("device.description")
+        # Cached descriptive name, see get_descriptive_name()
+        self._descriptive_name = None
 
         # Assign every port's owner_card
         for port in self.ports.values():
@@ -76,14 +78,22 @@ class Card(GObject.GObject):
 
     def get_descriptive_name(self) -> str:
         """Return a 'descriptive' name for the card, which consists of the name of an available output port with the
-        highest priority (this is the behaviour Gnome Sound Panel implements) and the card's description."""
-        max_port = None
-        for port in self.ports.values():
-            if port.is_available and port.is_output and (max_port is None or port.priority > max_port.priority):
-                max_port = port
-
-        # If a suitable port found, return it combined with the description, otherwise just use the description
-        return '{} - {}'.format(max_port.description, self.description) if max_port else self.description
+        highest priority (this is the behaviour Gnome Sound Panel implements) and the card's description. The value is
+        cached until invalidate_descriptive_name() is called."""
+        if self._descriptive_name is None:
+            max_port = None
+            for port in self.ports.values():
+                if port.is_available and port.is_output and (max_port is None or port.priority > max_port.priority):
+                    max_port = port
+
+            # If a suitable port found, combine it with the description, otherwise just use the description
+            self._descriptive_name = \
+                '{} - {}'.format(max_port.description, self.description) if max_port else self.description
+        return self._descriptive_name
+
+    def invalidate_descriptive_name(self):
+        """Drop the cached descriptive name, forcing it to be recalculated on the next get_descriptive_name() call."""
+        self._descriptive_name = None
 
     def update_port_activity(self, sources: dict, sinks: dict):
         """Updates the is_active state of every port on the card, according to the state of the related sink/source
@@ -92,6 +92,12 @@ class Config(dict):
                 value = Config(value)
             dict.__setitem__(self, key, value)
 
+    def snapshot(self) -> dict:
+        """Return a shallow copy of the configuration as a plain dict, for reading multiple top-level values at once
+        (nested values aren't copied).
+        """
+        return dict(self)
+
     def update(self, *args, **kwargs):
         """Override to provide proper setter calls, also for the constructor."""
         # Process positional arguments (a single iterable is allowed)
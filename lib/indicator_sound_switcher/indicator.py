@@ -984,9 +984,8 @@ class SoundSwitcherIndicator(GObject.GObject):
 
     def menu_setup(self):
         """Initialise the indicator menu."""
-        # Remove all menu items
-        for item in self.menu.get_children():
-            self.menu.remove(item)
+        # Remove all menu items, letting the menu iterate its children itself instead of building a list of them
+        self.menu.foreach(self.menu.remove)
 
         # Make the input list section, if needed
         if bool(self.config['show_inputs', True]):
@@ -27,6 +27,10 @@ class Port(GObject.GObject):
     def set_is_available(self, value: bool):
         self._is_available = value
 
+        # Port availability affects the owner card's descriptive name
+        if self.owner_card is not None:
+            self.owner_card.invalidate_descriptive_name()
+
         # Show or hide the corresponding menu item
         if self.menu_item:
             if self.is_available or self.always_avail:
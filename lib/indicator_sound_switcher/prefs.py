@@ -1,11 +1,66 @@
+import itertools
 import logging
 import os
-from threading import Timer
 
-from gi.repository import Gtk, Pango, GLib, Gdk
+from gi.repository import Gtk, Pango, GLib, Gdk, Gio
 
 from . import utils
+from .card import Card
 from .config import Config
+from .port import Port
+
+# Preferences dialog UI file
+_UI_FILE = os.path.join(os.path.dirname(__file__), 'prefs.glade')
+
+# Template of a device/port list box row
+_ROW_TEMPLATE = """<interface>
+  <object class="GtkListBoxRow" id="row">
+    <property name="visible">True</property>
+    <child>
+      <object class="GtkGrid">
+        <property name="visible">True</property>
+        <property name="border_width">12</property>
+        <property name="column_spacing">6</property>
+        <property name="row_spacing">6</property>
+        <property name="hexpand">True</property>
+        <child>
+          <object class="GtkImage" id="icon">
+            <property name="visible">True</property>
+          </object>
+          <packing>
+            <property name="left_attach">0</property>
+            <property name="top_attach">0</property>
+            <property name="height">2</property>
+          </packing>
+        </child>
+        <child>
+          <object class="GtkLabel" id="title">
+            <property name="visible">True</property>
+            <property name="xalign">0</property>
+            <attributes>
+              <attribute name="weight" value="bold"/>
+            </attributes>
+          </object>
+          <packing>
+            <property name="left_attach">1</property>
+            <property name="top_attach">0</property>
+          </packing>
+        </child>
+        <child>
+          <object class="GtkLabel" id="name">
+            <property name="visible">True</property>
+            <property name="xalign">0</property>
+          </object>
+          <packing>
+            <property name="left_attach">1</property>
+            <property name="top_attach">1</property>
+          </packing>
+        </child>
+      </object>
+    </child>
+  </object>
+</interface>
+"""
 
 
 class PreferencesDialog:
@@ -14,6 +69,9 @@ class PreferencesDialog:
     # Preferences dialog singleton
     _dlg = None
 
+    # Number of devices added to the devices list in one go
+    DEVICES_BATCH_SIZE = 16
+
     @classmethod
     def show(cls, indicator):
         """Instantiate and run a Preferences dialog."""
@@ -38,20 +96,36 @@ class PreferencesDialog:
     def __init__(self, indicator):
         """Constructor."""
         self.indicator = indicator
-        self.refresh_timer = None
+        self.refresh_source_id = None
 
-        # Open and parse the XML UI file otherwise
+        # Open and parse the XML UI file otherwise. Port props widgets are only built on demand, see
+        # build_port_props_widgets()
         self.builder = Gtk.Builder()
-        self.builder.add_from_file(os.path.join(os.path.dirname(__file__), 'prefs.glade'))
+        self.builder.add_objects_from_file(_UI_FILE, ['pref_profile_store', 'prefs_dialog'])
+        self._port_props_built = False
 
         # Remove the 2-pixel "aura" around the notebook
         self.prefs_dialog.get_content_area().set_border_width(0)
 
-        # Create a text renderer for preferred profiles to support ellipsizing the text
-        renderer_text = Gtk.CellRendererText()
-        renderer_text.props.ellipsize = Pango.EllipsizeMode.END
-        self.cb_port_pref_profile.pack_start(renderer_text, True)
-        self.cb_port_pref_profile.add_attribute(renderer_text, 'text', 1)
+        # Device and port models, created once the Devices page is first shown
+        self.devices_store = None
+        self.ports_store = None
+
+        # Card whose ports are currently listed in the ports list box
+        self._current_card = None
+
+        # ID of the idle source populating the devices model, if any
+        self._devices_source_id = None
+
+        # List row icon surfaces (or None for an icon that couldn't be loaded), indexed by (icon name, scale factor).
+        # Kept per dialog so that an icon theme change is picked up the next time the dialog is opened
+        self._icon_surfaces = {}
+
+        # General page - switches. They're set before any signal handler is connected, so toggling them doesn't need
+        # locking
+        cfg = self.indicator.config.snapshot()
+        self.sw_show_inputs.set_active (cfg.get('show_inputs',  True))
+        self.sw_show_outputs.set_active(cfg.get('show_outputs', True))
 
         # Update widgets
         self.updating_widgets = 0
@@ -68,80 +142,111 @@ class PreferencesDialog:
 
     def run(self):
         """Main routine. Show and run the dialog."""
-        self.prefs_dialog.show_all()
+        # All widgets are marked visible in the UI file, so there's no need for a recursive show_all()
+        self.prefs_dialog.show()
         self.prefs_dialog.run()
         self.prefs_dialog.destroy()
 
     def indicator_refresh_cb(self):
-        """Delayed indicator refresh and the configuration write-out callback."""
-        if self.refresh_timer:
-            # Kill the existing timer, if any
-            self.refresh_timer.cancel()
-            self.refresh_timer = None
-
-            # Save the configuration
-            self.indicator.config_save()
-
-            # Refresh the indicator (on idle)
-            GLib.idle_add(self.indicator.on_refresh)
+        """Run the pending indicator refresh and the configuration write-out right away, if any."""
+        if self.refresh_source_id:
+            # Kill the existing timeout
+            GLib.source_remove(self.refresh_source_id)
+            self.refresh_source_id = None
+            self.indicator_refresh()
+
+    def indicator_refresh(self):
+        """Save the configuration and refresh the indicator."""
+        self.indicator.config_save()
+
+        # Refresh the indicator (on idle)
+        GLib.idle_add(self.indicator.on_refresh)
+
+    def on_refresh_timeout(self) -> bool:
+        """Timeout callback: delayed indicator refresh and the configuration write-out."""
+        self.refresh_source_id = None
+        self.indicator_refresh()
+        return False
 
     def schedule_refresh(self):
-        """(Re)schedule a delayed indicator refresh and the configuration write-out."""
-        # Kill the existing timer, if any
-        if self.refresh_timer:
-            self.refresh_timer.cancel()
+        """(Re)schedule a delayed indicator refresh and the configuration write-out. Changes made in quick succession
+        are coalesced into a single refresh."""
+        # Kill the existing timeout, if any
+        if self.refresh_source_id:
+            GLib.source_remove(self.refresh_source_id)
 
         # Schedule a refresh after 2 seconds
-        self.refresh_timer = Timer(2.0, self.indicator_refresh_cb)
-        self.refresh_timer.start()
+        self.refresh_source_id = GLib.timeout_add_seconds(2, self.on_refresh_timeout)
 
     def update_widgets(self):
         """Update the state of 'top level' widgets."""
         # Lock signal handlers
         self.updating_widgets += 1
 
-        # General page - switches
-        self.sw_show_inputs.set_active (self.indicator.config['show_inputs',  True])
-        self.sw_show_outputs.set_active(self.indicator.config['show_outputs', True])
-
-        # Device page - device list
-        for card in self.indicator.cards.values():
-            # Add a grid
-            grid = Gtk.Grid(border_width=12, column_spacing=6, row_spacing=6, hexpand=True)
+        # Device page, if it's been initialised
+        if self.devices_store is not None:
+            self.update_devices_widgets()
 
-            # Add a list box row
-            row = Gtk.ListBoxRow(child=grid)
+        # Unlock signal handlers
+        self.updating_widgets -= 1
 
-            # Store device's name, ports and profiles as additional attributes in the row
-            row.device_name = card.name
-            row.device_ports = {
-                p.name: {
-                    'description':  p.description,
-                    'is_output':    p.is_output,
-                    'is_available': p.is_available,
-                    'profiles':     p.profiles,
-                } for p in card.ports.values()
-            }
-            row.device_profiles = {p.name: p.description for p in card.profiles.values()}
+    def initialise_devices_page(self):
+        """Initialise the Devices page on its first activation."""
+        # Bind the device and port list boxes to their models: rows get created on demand by the factory functions
+        self.devices_store = Gio.ListStore.new(Card)
+        self.lbx_devices.bind_model(self.devices_store, self.create_device_row)
+        self.ports_store = Gio.ListStore.new(Port)
+        self.lbx_ports.bind_model(self.ports_store, self.create_port_row)
 
-            # Add an icon
-            grid.attach(Gtk.Image.new_from_icon_name('yast_soundcard', Gtk.IconSize.MENU), 0, 0, 1, 2)
+        # The ports list box holds the ports of all devices, only showing those of the selected one
+        self.lbx_ports.set_filter_func(self.filter_port_row)
 
-            # Add a device title label
-            grid.attach(utils.lbl_bold(card.get_descriptive_name(), xalign=0), 1, 0,  1, 1)
+        # Connect the port selection handler manually to be able to block it while the ports list is being updated
+        self._port_selected_handler = self.lbx_ports.connect('row-selected', self.on_port_row_selected)
 
-            # Add a device name label
-            grid.attach(Gtk.Label(card.name, xalign=0), 1, 1,  1, 1)
+        # Populate the page
+        self.updating_widgets += 1
+        self.update_devices_widgets()
+        self.updating_widgets -= 1
 
-            # Add the row to the list box
-            self.lbx_devices.add(row)
+    def update_devices_widgets(self):
+        """Update the state of the Devices page widgets."""
+        # Clear the device and port lists and refill them on idle, in batches
+        self.cancel_devices_population()
+        with utils.batch_update(self.lbx_devices):
+            self.devices_store.remove_all()
+        with utils.batch_update(self.lbx_ports, detach=True):
+            self.ports_store.remove_all()
+        self._devices_source_id = GLib.idle_add(self.add_next_devices, iter(list(self.indicator.cards.values())))
 
         # Update device and port props widgets
         self.update_dev_props_widgets()
         self.update_port_props_widgets()
 
-        # Unlock signal handlers
-        self.updating_widgets -= 1
+    def add_next_devices(self, cards) -> bool:
+        """Idle callback that adds the next batch of devices to the devices model, and their ports to the ports model.
+        :param cards: iterator over the Card objects still to be added
+        :return: True if there are more devices to add, False when done
+        """
+        batch = list(itertools.islice(cards, self.DEVICES_BATCH_SIZE))
+
+        # Each splice emits a single items-changed. No batch_update() here: hiding or detaching the list boxes would
+        # take keyboard focus away from the user navigating them meanwhile
+        self.devices_store.splice(self.devices_store.get_n_items(), 0, batch)
+        self.ports_store.splice(
+            self.ports_store.get_n_items(), 0, [port for card in batch for port in card.ports.values()])
+
+        # Continue for as long as there are devices left
+        if len(batch) == self.DEVICES_BATCH_SIZE:
+            return True
+        self._devices_source_id = None
+        return False
+
+    def cancel_devices_population(self):
+        """Stop populating the devices model, if it's in progress."""
+        if self._devices_source_id is not None:
+            GLib.source_remove(self._devices_source_id)
+            self._devices_source_id = None
 
     def update_dev_props_widgets(self):
         """Update device props widgets."""
@@ -151,60 +256,62 @@ class PreferencesDialog:
         # Get selected row
         row = self.lbx_devices.get_selected_row()
 
-        # Remove all ports from the ports list box
-        for port_row in self.lbx_ports.get_children():
-            port_row.destroy()
+        # Filter the ports list, but only if the selected device has changed
+        card = row.card if row is not None else None
+        if card is not self._current_card:
+            self._current_card = card
+
+            # Inhibit port (un)selection events while updating, and update port props widgets only once afterwards
+            with self.lbx_ports.handler_block(self._port_selected_handler):
+                # Drop port selection as the selected port may be filtered out
+                self.lbx_ports.unselect_all()
+                with utils.batch_update(self.lbx_ports, detach=True):
+                    self.lbx_ports.invalidate_filter()
+            self.update_port_props_widgets()
 
         # If there's a selected row
         if row is not None:
             device_cfg = self.get_current_device_config()
             self.e_device_name.set_text(device_cfg['name', ''])
 
-            # Iterate through device's ports
-            for name, port in row.device_ports.items():
-                # Add a grid
-                grid = Gtk.Grid(border_width=12, column_spacing=6, row_spacing=6, hexpand=True)
-
-                # Add a list box row
-                port_row = Gtk.ListBoxRow(child=grid)
-                port_row.port_name = name
-                port_row.port_profiles = port['profiles']
-
-                # Add an icon: checkmark or a cross, depending on the port's current availability
-                grid.attach(
-                    Gtk.Image.new_from_icon_name('gtk-ok' if port['is_available'] else 'gtk-no', Gtk.IconSize.MENU),
-                    0, 0, 1, 2)
-
-                # Add a port title label
-                grid.attach(
-                    utils.lbl_bold(
-                        '{}: {}'.format(_('Out') if port['is_output'] else _('In'), port['description']),
-                        xalign=0),
-                    1, 0, 1, 1)
-
-                # Add a port name label
-                grid.attach(Gtk.Label(name, xalign=0), 1, 1,  1, 1)
-
-                # Add the row to the list box
-                self.lbx_ports.add(port_row)
-
-            # Show all rows' widgets
-            self.lbx_ports.show_all()
-
         # Enable widgets
-        self.bx_dev_props.set_sensitive(row is not None)
+        self.g_dev_props.set_sensitive(row is not None)
 
         # Unlock signal handlers
         self.updating_widgets -= 1
 
+    def build_port_props_widgets(self):
+        """Build the port properties widgets and put them onto the Devices page."""
+        self.builder.add_objects_from_file(_UI_FILE, ['g_port_props'])
+        self.builder.connect_signals(self)
+        self._port_props_built = True
+
+        # Bind the preferred profile combobox to its model and create a text renderer for it to support ellipsizing
+        # the text
+        self.cb_port_pref_profile.set_model(self.pref_profile_store)
+        renderer_text = Gtk.CellRendererText()
+        renderer_text.props.ellipsize = Pango.EllipsizeMode.END
+        self.cb_port_pref_profile.pack_start(renderer_text, True)
+        self.cb_port_pref_profile.add_attribute(renderer_text, 'text', 1)
+
+        # Place the widgets under the Port settings title
+        self.g_devices.attach(self.g_port_props, 2, 1, 1, 1)
+
     def update_port_props_widgets(self):
         """Update port properties widgets."""
+        port_row = self.lbx_ports.get_selected_row()
+
+        # Port props widgets only get built once a port is selected for the first time
+        if not self._port_props_built:
+            if port_row is None:
+                return
+            self.build_port_props_widgets()
+
         # Lock signal handlers
         self.updating_widgets += 1
 
         # Get selected port's config
         device_row = self.lbx_devices.get_selected_row()
-        port_row   = self.lbx_ports.get_selected_row()
         port_cfg   = self.get_current_port_config()
         if device_row is not None and port_row is not None and port_cfg is not None:
             self.sw_port_visible.set_active(bool(port_cfg['visible', True]))
@@ -214,10 +321,10 @@ class PreferencesDialog:
             # Update port's preferred profile combobox
             self.pref_profile_store.clear()
             self.pref_profile_store.append(['', _('(none)')])
-            for name, desc in device_row.device_profiles.items():
+            for profile in device_row.card.profiles.values():
                 # Only add profiles that the port supports
-                if name in port_row.port_profiles:
-                    self.pref_profile_store.append([name, desc])
+                if profile.name in (port_row.port.profiles or ()):
+                    self.pref_profile_store.append([profile.name, profile.description])
             self.cb_port_pref_profile.set_active_id(port_cfg['preferred_profile', ''] or '')
 
             # Update port's keyboard shortcut
@@ -229,6 +336,63 @@ class PreferencesDialog:
         # Unlock signal handlers
         self.updating_widgets -= 1
 
+    def get_icon_surface(self, icon_name: str):
+        """Load a menu-sized icon by its name, at the dialog's scale factor, once and return the (cached) surface.
+        :param icon_name: name of the icon in the current icon theme
+        :return: cairo.Surface instance or None if the icon couldn't be loaded
+        """
+        scale = self.prefs_dialog.get_scale_factor()
+        key = (icon_name, scale)
+        if key not in self._icon_surfaces:
+            surface = None
+            try:
+                size = Gtk.icon_size_lookup(Gtk.IconSize.MENU)[1]
+                surface = Gtk.IconTheme.get_default().load_surface(icon_name, size, scale, None, 0)
+            except GLib.Error as e:
+                logging.debug('Failed to load icon `%s`: %s', icon_name, e)
+            self._icon_surfaces[key] = surface
+        return self._icon_surfaces[key]
+
+    def new_list_row(self, icon_name: str, title: str, name: str) -> Gtk.ListBoxRow:
+        """Create and return a new device/port list box row from the row template.
+        :param icon_name: name of the icon to display
+        :param title: row title text, displayed in bold
+        :param name: (internal) name of the device/port, displayed under the title
+        """
+        builder = Gtk.Builder.new_from_string(_ROW_TEMPLATE, -1)
+
+        # Prefer a shared surface, falling back to a theme lookup if the icon couldn't be loaded
+        surface = self.get_icon_surface(icon_name)
+        if surface is not None:
+            builder.get_object('icon').set_from_surface(surface)
+        else:
+            builder.get_object('icon').set_from_icon_name(icon_name, Gtk.IconSize.MENU)
+        builder.get_object('title').set_text(title)
+        builder.get_object('name').set_text(name)
+        return builder.get_object('row')
+
+    def create_device_row(self, card: Card) -> Gtk.ListBoxRow:
+        """Create and return a new list box row for the given device (card), to be used in the devices list box."""
+        row = self.new_list_row('yast_soundcard', card.get_descriptive_name(), card.name)
+        row.card = card
+        return row
+
+    def create_port_row(self, port: Port) -> Gtk.ListBoxRow:
+        """Create and return a new list box row for the given device port, to be used in the ports list box."""
+        # Use a checkmark or a cross icon, depending on the port's current availability
+        row = self.new_list_row(
+            'gtk-ok' if port.is_available else 'gtk-no',
+            '{}: {}'.format(_('Out') if port.is_output else _('In'), port.description),
+            port.name)
+
+        # Store the port in the row
+        row.port = port
+        return row
+
+    def filter_port_row(self, row: Gtk.ListBoxRow) -> bool:
+        """Ports list box filter function: only lets through ports of the currently selected device."""
+        return row.port.owner_card is self._current_card
+
     def enable_port_props_widgets(self):
         """Update enabled state of port properties widgets."""
         # Visible switch
@@ -244,7 +408,7 @@ class PreferencesDialog:
         :return: device Config instance or None if there's no device selected.
         """
         row = self.lbx_devices.get_selected_row()
-        return self.indicator.config['devices'][row.device_name] if row is not None else None
+        return self.indicator.config['devices'][row.card.name] if row is not None else None
 
     def get_current_port_config(self) -> Config:
         """Fetch and return the Config object that corresponds to the currently selected device port. Enforces that it's
@@ -257,10 +421,10 @@ class PreferencesDialog:
             row = self.lbx_ports.get_selected_row()
             if row is not None:
                 # Make sure the port's config is a Config instance (previously it could also be a string or False)
-                port_cfg = device_cfg['ports'][row.port_name]
+                port_cfg = device_cfg['ports'][row.port.name]
                 if type(port_cfg) is not Config:
                     port_cfg = {}
-                    device_cfg['ports'][row.port_name] = port_cfg
+                    device_cfg['ports'][row.port.name] = port_cfg
         return port_cfg
 
     def remove_shortcut_binding(self, shortcut: str):
@@ -276,6 +440,8 @@ class PreferencesDialog:
     def on_destroy(self, dlg):
         """Signal handler: dialog destroying."""
         logging.debug('PreferencesDialog.on_destroy()')
+        self.cancel_devices_population()
+
         # Make sure config update has run
         self.indicator_refresh_cb()
 
@@ -284,6 +450,12 @@ class PreferencesDialog:
         logging.debug('PreferencesDialog.on_refresh()')
         self.update_widgets()
 
+    def on_page_switched(self, notebook: Gtk.Notebook, page: Gtk.Widget, page_num: int):
+        """Signal handler: notebook page switched."""
+        logging.debug('PreferencesDialog.on_page_switched(%d)', page_num)
+        if page is self.g_devices and self.devices_store is None:
+            self.initialise_devices_page()
+
     def on_device_row_selected(self, list_box: Gtk.ListBox, row: Gtk.ListBoxRow):
         """Signal handler: devices list box row (un)selected."""
         logging.debug('PreferencesDialog.on_device_row_selected()')
@@ -296,8 +468,6 @@ class PreferencesDialog:
 
     def on_show_inputs_switched(self, widget, data):
         """Signal handler: Show inputs switch changed."""
-        if self.updating_widgets > 0:
-            return
         val = widget.get_active()
         logging.debug('PreferencesDialog.on_show_inputs_switched(%s)', val)
         self.indicator.config['show_inputs'] = val
@@ -305,8 +475,6 @@ class PreferencesDialog:
 
     def on_show_outputs_switched(self, widget, data):
         """Signal handler: Show outputs switch changed."""
-        if self.updating_widgets > 0:
-            return
         val = widget.get_active()
         logging.debug('PreferencesDialog.on_show_outputs_switched(%s)', val)
         self.indicator.config['show_outputs'] = val
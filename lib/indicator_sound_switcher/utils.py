@@ -1,4 +1,6 @@
 """Various utility functions."""
+from contextlib import contextmanager
+
 from gi.repository import Gtk, Gdk
 
 
@@ -27,6 +29,33 @@ def labeled_widget(label: str, widget: Gtk.Widget, resizable: bool = True) -> Gt
     return box
 
 
+@contextmanager
+def batch_update(widget: Gtk.Widget, detach: bool = False):
+    """Context manager for bulk-modifying a container's children: child notifications are held back and the widget is
+    hidden while the block is being executed, so that no intermediate style and size updates take place. Both hiding and
+    detaching reset the window focus if it's inside the widget, so it's only suitable for updates triggered from outside
+    the widget, not ones that may run while the user is navigating it.
+    :param widget: (container) widget to update
+    :param detach: whether to temporarily remove the widget from its parent rather than just hide it, which also
+        spares style propagation through the widget's subtree
+    """
+    parent = widget.get_parent() if detach else None
+    visible = widget.get_visible()
+    widget.freeze_child_notify()
+    if parent is not None:
+        parent.remove(widget)
+    else:
+        widget.set_visible(False)
+    try:
+        yield widget
+    finally:
+        if parent is not None:
+            parent.add(widget)
+        else:
+            widget.set_visible(visible)
+        widget.thaw_child_notify()
+
+
 def get_key_name(state: Gdk.ModifierType, keyval: int) -> str:
     """Decode the provided state and key value and return a human-readable name for the keyboard shortcut.
     :param state: modifier state of the keyboard shortcut